@@ -2,11 +2,11 @@
 import tkinter
 import enum
 import time
-import queue
+import collections
 import random
 import itertools
+import functools
 import math
-import cmath
 
 """
 This program contains a wrapper around tkinter's functions to make it less of a pain to use.
@@ -23,13 +23,20 @@ class Shape(enum.Enum):
 
 
 class Vector2:
+    __slots__ = ("x", "y", "_norm")
+
     def __init__(self, x, y):
         self.x = x
         self.y = y
+        # cached until Coords.iadd (via Sprite.shift) moves the vector, which
+        # clears it
+        self._norm = None
 
     @property
     def norm(self):
-        return math.sqrt(self.x**2 + self.y**2)
+        if self._norm is None:
+            self._norm = math.hypot(self.x, self.y)
+        return self._norm
 
     @property
     def polar(self):
@@ -38,15 +45,22 @@ class Vector2:
     @classmethod
     def from_polar(cls, angle, radius):
         angle = math.radians(angle)
-        z = radius * (cmath.exp(1j * angle))
-        return cls(z.real, z.imag)
+        return cls(radius * math.cos(angle), radius * math.sin(angle))
 
     def rotate_around_origin(self, theta):
-        angle, radius = self.polar
-        return self.__class__.from_polar(angle + theta, radius)
+        return self.rotate(math.radians(theta))
+
+    def rotate(self, theta):
+        # theta in radians; a plain 2x2 rotation, no trip through polar form
+        cos = math.cos(theta)
+        sin = math.sin(theta)
+        return self.__class__(
+            self.x * cos - self.y * sin, self.x * sin + self.y * cos
+        )
 
     def normalize(self):
-        return self * (1 / self.norm)
+        norm = self.norm
+        return Vector2(self.x / norm, self.y / norm)
 
     def __repr__(self):
         return f"Vector2({self.x}, {self.y})"
@@ -83,49 +97,131 @@ class Vector2:
 
 
 class Coords:
+    __slots__ = ("coords", "_flat")
+
     def __init__(self, *coords):
         self.coords = [
             Vector2(*coor) if not isinstance(coor, Vector2) else coor for coor in coords
         ]
+        self._flat = None
+
+    @classmethod
+    def from_vectors(cls, vectors):
+        # skip the per-item conversion in __init__ when we already have Vector2s
+        new = cls.__new__(cls)
+        new.coords = vectors
+        new._flat = None
+        return new
 
     def as_list(self):
-        return [
-            item
-            for sublist in [coor.as_tuple() for coor in self.coords]
-            for item in sublist
-        ]
+        # cached until a point is replaced; callers only read it
+        if self._flat is not None:
+            return self._flat
+        coords = self.coords
+        # nearly everything is a rectangle/oval (2 points) or text (1 point)
+        if len(coords) == 2:
+            a, b = coords
+            flat = [a.x, a.y, b.x, b.y]
+        elif len(coords) == 1:
+            flat = [coords[0].x, coords[0].y]
+        else:
+            flat = list(itertools.chain.from_iterable((c.x, c.y) for c in coords))
+        self._flat = flat
+        return flat
 
     def __getitem__(self, item):
         return self.coords[item]
 
     def __setitem__(self, item, value):
         self.coords[item] = value
+        self._flat = None
 
     def __add__(self, vec):
-        return Coords(*[v + vec for v in self.coords])
+        return Coords.from_vectors([v + vec for v in self.coords])
 
     def __sub__(self, vec):
-        return Coords(*[v - vec for v in self.coords])
+        return Coords.from_vectors([v - vec for v in self.coords])
 
     def __mul__(self, num):
-        return Coords(*[v * num for v in self.coords])
+        return Coords.from_vectors([v * num for v in self.coords])
+
+    def iadd(self, vec):
+        # in place, for coords no one else holds on to
+        dx = vec.x
+        dy = vec.y
+        for v in self.coords:
+            v.x += dx
+            v.y += dy
+            v._norm = None
+        self._flat = None
+        return self
 
 
 class TkWrapper:
     def __init__(self, canvas):
         self.canvas = canvas
+        # look the canvas methods up once instead of on every call
+        self._draw = {shape: getattr(canvas, shape.value) for shape in Shape}
+        self._itemconfig = canvas.itemconfig
+        self._delete = canvas.delete
+        self._tk_call = canvas.tk.call
+        self._path = str(canvas)
+        # latest coords per item, an item moved twice in a frame is sent once
+        self._pending_coords = {}
+        # option changes per item, merged until the next flush
+        self._pending_config = {}
+        # the options each item was last given, so unchanged ones aren't resent
+        self._sent_config = {}
+        # moves are queued and applied by this proc in one Tcl call per frame
+        canvas.tk.eval(
+            "proc gloom_bulk_coords {canvas items} {"
+            "foreach {id coords} $items {$canvas coords $id {*}$coords}"
+            "}"
+        )
 
     def draw_call(self, shape, coords, kwargs):
-        return self._call(shape.value, coords.as_list(), kwargs)
+        itemid = self._draw[shape](*coords.as_list(), **kwargs)
+        self._sent_config[itemid] = dict(kwargs)
+        return itemid
 
     def itemconfig_call(self, itemid, kwargs):
-        return self._call("itemconfig", [itemid], kwargs)
+        sent = self._sent_config.setdefault(itemid, {})
+        changed = {
+            key: value
+            for key, value in kwargs.items()
+            if key not in sent or sent[key] != value
+        }
+        if not changed:
+            return
+        sent.update(changed)
+        if itemid in self._pending_config:
+            self._pending_config[itemid].update(changed)
+        else:
+            self._pending_config[itemid] = changed
 
     def coords_call(self, itemid, coords):
-        return self._call("coords", [itemid, *coords.as_list()], {})
+        self._pending_coords[itemid] = coords.as_list()
+
+    def flush(self):
+        # called once at the end of every Game._internal_tick; changes made
+        # between ticks (key handlers, timers) go out with the next one
+        pending, self._pending_coords = self._pending_coords, {}
+        if pending:
+            self._tk_call(
+                "gloom_bulk_coords",
+                self._path,
+                list(itertools.chain.from_iterable(pending.items())),
+            )
+        config, self._pending_config = self._pending_config, {}
+        for itemid, kwargs in config.items():
+            self._itemconfig(itemid, **kwargs)
 
-    def destroy_call(self, itemid):
-        return self._call("delete", [itemid], {})
+    def destroy_call(self, *itemids):
+        for itemid in itemids:
+            self._pending_coords.pop(itemid, None)
+            self._pending_config.pop(itemid, None)
+            self._sent_config.pop(itemid, None)
+        return self._delete(*itemids)
 
     def _call(self, *fargs):
         method, args, kwargs = fargs
@@ -139,6 +235,9 @@ class Sprite:
     fill = None
     tag = None
     kwargs = {}
+    _center_coords = None
+    # set when kwargs changed since they were last pushed to the canvas
+    _dirty_config = False
 
     def __init__(self, coords, shape=None, **kwargs):
         self.coords = coords
@@ -148,7 +247,7 @@ class Sprite:
         if self.tag is not None:
             self.kwargs["tag"] = self.tag
         self.shape = shape or self.shape
-        self.timer = self._add()
+        self._add()
         self.render()
 
     def render(self):
@@ -159,11 +258,12 @@ class Sprite:
     def update(self, coords=True, kwargs=True):
         if coords:
             self.game.canvas_wrapper.coords_call(self.id, self.coords)
-        if kwargs:
+        if kwargs and self._dirty_config:
+            self._dirty_config = False
             self.game.canvas_wrapper.itemconfig_call(self.id, self.kwargs)
 
     def send_event(self, etype, *args):
-        self.game.event_queue.put((etype, self, args))
+        self.game.event_queue.append((etype, self, args))
 
     def _tick(self):
         self.tick()
@@ -178,11 +278,12 @@ class Sprite:
         self.thread.join()
 
     def quit(self):
-        self.game.remove_sprite(self)
+        self.detach()
         self.game.canvas_wrapper.destroy_call(self.id)
-        self.timer.stop()
-        if self.timer in self.game.timers:
-            self.game.timers.remove(self.timer)
+
+    def detach(self):
+        # everything quit() does except deleting the canvas item
+        self.game.remove_sprite(self)
 
     def _add(self):
         return self.game.add_sprite(self)
@@ -191,9 +292,22 @@ class Sprite:
     def instantiate(cls, *args, **kwargs):
         return cls(*args, **kwargs)
 
+    def shift(self, vec):
+        # mutates self.coords in place, so center_point's identity check would
+        # miss it; clearing _center_coords is what keeps that cache valid
+        self.coords.iadd(vec)
+        self._center_coords = None
+
     @property
     def center_point(self):
-        return (self.coords[0] + self.coords[1]) * 0.5
+        # coords get replaced (or moved through shift), so the center only
+        # needs recomputing when self.coords is a different object than last time;
+        # any other in-place change to self.coords has to clear _center_coords too
+        if self._center_coords is not self.coords:
+            a, b = self.coords.coords
+            self._center = Vector2((a.x + b.x) * 0.5, (a.y + b.y) * 0.5)
+            self._center_coords = self.coords
+        return self._center
 
     @property
     def fill(self):
@@ -201,7 +315,9 @@ class Sprite:
 
     @fill.setter
     def fill(self, to):
-        self.kwargs["fill"] = to
+        if self.kwargs.get("fill") != to:
+            self.kwargs["fill"] = to
+            self._dirty_config = True
 
     @property
     def text(self):
@@ -209,32 +325,55 @@ class Sprite:
 
     @text.setter
     def text(self, to):
-        self.kwargs["text"] = to
+        if self.kwargs.get("text") != to:
+            self.kwargs["text"] = to
+            self._dirty_config = True
 
 
 class Sprites:
     def __init__(self, sprites=set()):
-        self.sprites = set(sprites)
+        # a dict used as an ordered set: O(1) add and remove, and iteration
+        # stays in insertion order
+        self.sprites = {}
+        self._by_name = collections.defaultdict(set)
+        for sprite in sprites:
+            self.add_sprite(sprite)
 
     def __iter__(self):
         return iter(self.sprites)
 
+    def __len__(self):
+        return len(self.sprites)
+
+    def __contains__(self, sprite):
+        return sprite in self.sprites
+
     def by_name(self, name):
-        return Sprites({sprite for sprite in self.sprites if sprite.name == name})
+        # the live index set; copy it before adding or removing sprites
+        return self._by_name.get(name, ())
 
     def add_sprite(self, sprite):
-        self.sprites.add(sprite)
+        self.sprites[sprite] = None
+        self._by_name[sprite.name].add(sprite)
 
     def remove_sprite(self, sprite):
-        self.sprites.remove(sprite)
+        del self.sprites[sprite]
+        self._by_name[sprite.name].discard(sprite)
 
     def run_all_threads(self):
         for sprite in self.sprites:
             sprite.start()
 
     def destroy(self):
-        for sprite in self.sprites.copy():
-            sprite.quit()
+        # a single canvas delete for the whole group instead of one per sprite
+        if not self.sprites:
+            return
+        wrapper = next(iter(self.sprites)).game.canvas_wrapper
+        ids = []
+        for sprite in list(self.sprites):
+            sprite.detach()
+            ids.append(sprite.id)
+        wrapper.destroy_call(*ids)
 
     def try_run(self, funname):
         for sprite in self.sprites:
@@ -243,6 +382,8 @@ class Sprites:
 
 
 class Timer:
+    __slots__ = ("timeout", "callback", "root", "stopped")
+
     def __init__(self, timeout, callback, root):
         self.timeout = timeout
         self.callback = callback
@@ -290,7 +431,7 @@ class Game:
         self.canvas = tkinter.Canvas(bd=0, highlightthickness=0, relief='ridge')
         self.canvas.pack(expand=True, fill="both")
         self.sprites = Sprites()
-        self.event_queue = queue.Queue()
+        self.event_queue = collections.deque()
 
         self.canvas_wrapper = TkWrapper(self.canvas)
         self.canvas["width"], self.canvas["height"] = self.screen_size
@@ -347,15 +488,10 @@ class Game:
 
     def add_sprite(self, sprite):
         self.sprites.add_sprite(sprite)
-        timer = self.create_timer(1000 / self.fps)(sprite._tick)
-        if self.started:
-            # timer()
-            pass
-        return timer
 
     def remove_sprite(self, sprite):
-        if sprite in self.sprites.sprites:
-            self.sprites.sprites.remove(sprite)
+        if sprite in self.sprites:
+            self.sprites.remove_sprite(sprite)
 
     @classmethod
     def add_event_handler(self, event_type, func):
@@ -376,11 +512,17 @@ class Game:
         tm = time.perf_counter()
         delta = tm - self._time
         self._time = tm
-        while not self.event_queue.empty():
-            event, caller, args = self.event_queue.get()
+        while self.event_queue:
+            event, caller, args = self.event_queue.popleft()
             if event in self.event_handlers:
                 self.event_handlers[event](self, caller, *args)
         self.tick(delta)
+        # sprites are ticked from the one game timer instead of each
+        # scheduling its own Tk timer
+        for sprite in tuple(self.sprites):
+            sprite._tick()
+        # hand the frame's canvas changes to Tk in one go
+        self.canvas_wrapper.flush()
 
     def after(self, timeout, callback):
         self.root.after(int(timeout), callback)
@@ -422,25 +564,148 @@ KEYCARDS = {}
 NSTEPS = 1
 
 
-def intersect(p1, p2, p3, p4):
+def intersect_batch(p1, p2, segments, ignore=None):
+    # segment-segment test of p1-p2 against a whole list of
+    # (x3, y3, x4 - x3, y4 - y3, owner) segments, with the p1-p2 terms computed
+    # once: the segments cross when both parameters ua (along p1-p2) and ub
+    # (along the segment) are in [0, 1]; parallel segments never count.
+    # returns the owner of the first segment crossed, or None
     x1, y1 = p1
     x2, y2 = p2
-    x3, y3 = p3
-    x4, y4 = p4
-    denom = (y4 - y3) * (x2 - x1) - (x4 - x3) * (y2 - y1)
-    if denom == 0:  # parallel
-        return None
-    ua = ((x4 - x3) * (y1 - y3) - (y4 - y3) * (x1 - x3)) / denom
-    if ua < 0 or ua > 1:  # out of range
-        return None
-    ub = ((x2 - x1) * (y1 - y3) - (y2 - y1) * (x1 - x3)) / denom
-    if ub < 0 or ub > 1:  # out of range
+    dx = x2 - x1
+    dy = y2 - y1
+    for x3, y3, ex, ey, owner in segments:
+        if owner is ignore:
+            continue
+        denom = ey * dx - ex * dy
+        if denom == 0:  # parallel
+            continue
+        ox = x1 - x3
+        oy = y1 - y3
+        # ua = na / denom and ub = nb / denom both have to be in [0, 1],
+        # which can be checked against denom without dividing
+        na = ex * oy - ey * ox
+        nb = dx * oy - dy * ox
+        if denom > 0:
+            if na < 0 or na > denom or nb < 0 or nb > denom:  # out of range
+                continue
+        elif na > 0 or na < denom or nb > 0 or nb < denom:  # out of range
+            continue
+        return owner
+    return None
+
+
+class WallGrid:
+    # uniform grid over the level's tiles; every cell lists the walls and the
+    # segments of the walls overlapping it, so a sight line or a moving box
+    # only has to be tested against the walls in the cells it touches
+    def __init__(self, walls, cell_size, resolution):
+        self.cell_w = cell_size.x
+        self.cell_h = cell_size.y
+        self.cols = resolution.x
+        self.rows = resolution.y
+        self.width = self.cols * self.cell_w
+        self.height = self.rows * self.cell_h
+        self.cells = [[] for _ in range(self.cols * self.rows)]
+        self.cell_walls = [[] for _ in range(self.cols * self.rows)]
+        self.segments = []
+        # (order, wall) per wall; the insertion order comes first so box
+        # queries visit walls like a scan of the list would
+        self.entries = {}
+        self._order = itertools.count()
+        for wall in walls:
+            self.add(wall)
+
+    def _cell_indices(self, wall):
+        return self._box_indices(*wall.coords.coords)
+
+    def _box_indices(self, a, b):
+        # grow the box by a pixel so boxes sitting exactly on a cell border
+        # land in both cells
+        x0 = max(int((min(a.x, b.x) - 1) / self.cell_w), 0)
+        x1 = min(int((max(a.x, b.x) + 1) / self.cell_w), self.cols - 1)
+        y0 = max(int((min(a.y, b.y) - 1) / self.cell_h), 0)
+        y1 = min(int((max(a.y, b.y) + 1) / self.cell_h), self.rows - 1)
+        return [
+            y * self.cols + x for y in range(y0, y1 + 1) for x in range(x0, x1 + 1)
+        ]
+
+    def add(self, wall):
+        entry = (next(self._order), wall)
+        self.entries[wall] = entry
+        self.segments.extend(wall.segments)
+        for index in self._cell_indices(wall):
+            self.cells[index].extend(wall.segments)
+            self.cell_walls[index].append(entry)
+
+    def remove(self, wall):
+        entry = self.entries.pop(wall)
+        self.segments = [seg for seg in self.segments if seg[4] is not wall]
+        for index in self._cell_indices(wall):
+            self.cells[index] = [
+                seg for seg in self.cells[index] if seg[4] is not wall
+            ]
+            self.cell_walls[index].remove(entry)
+
+    def query_box(self, coords):
+        # (order, wall) entries of the walls sharing a cell with coords, in
+        # insertion order
+        indices = self._box_indices(*coords.coords)
+        if len(indices) == 1:
+            return self.cell_walls[indices[0]]
+        found = set()
+        for index in indices:
+            found.update(self.cell_walls[index])
+        return sorted(found)
+
+    def query_segment(self, p1, p2, ignore=None):
+        # walks the cells crossed by p1-p2 (Amanatides & Woo) and returns the
+        # first wall hit, like intersect_batch over all segments would
+        x1, y1 = p1
+        x2, y2 = p2
+        if not (
+            0 <= x1 < self.width
+            and 0 <= x2 < self.width
+            and 0 <= y1 < self.height
+            and 0 <= y2 < self.height
+        ):
+            return intersect_batch(p1, p2, self.segments, ignore)
+        cw, ch = self.cell_w, self.cell_h
+        cx, cy = int(x1 / cw), int(y1 / ch)
+        end_x, end_y = int(x2 / cw), int(y2 / ch)
+        dx = x2 - x1
+        dy = y2 - y1
+        step_x = 1 if dx > 0 else -1
+        step_y = 1 if dy > 0 else -1
+        if dx:
+            t_delta_x = abs(cw / dx)
+            t_max_x = ((cx + (dx > 0)) * cw - x1) / dx
+        else:
+            t_delta_x = t_max_x = math.inf
+        if dy:
+            t_delta_y = abs(ch / dy)
+            t_max_y = ((cy + (dy > 0)) * ch - y1) / dy
+        else:
+            t_delta_y = t_max_y = math.inf
+        cols = self.cols
+        for _ in range(abs(end_x - cx) + abs(end_y - cy) + 1):
+            segments = self.cells[cy * cols + cx]
+            if segments:
+                hit = intersect_batch(p1, p2, segments, ignore)
+                if hit is not None:
+                    return hit
+            # never step past the end cell on an axis, so rounding can't make
+            # the walk wander off
+            if cy == end_y or (cx != end_x and t_max_x < t_max_y):
+                t_max_x += t_delta_x
+                cx += step_x
+            else:
+                t_max_y += t_delta_y
+                cy += step_y
         return None
-    x = x1 + ua * (x2 - x1)
-    y = y1 + ua * (y2 - y1)
-    return (x, y)
 
 
+@functools.lru_cache(maxsize=4096)
 def uncomment(string):
     if not string:
         return None
@@ -482,6 +747,41 @@ class Weapon:
                 range(1, self.bullets_per_shot // 2 + 1),
             )
         )
+        # the spread angles never change, so keep their (cos, sin) around
+        self._bullet_rotations = tuple(
+            (math.cos(math.radians(angle)), math.sin(math.radians(angle)))
+            for angle in self._bullet_angles
+        )
+        self._spawn = self._compile_spawn()
+
+    def _compile_spawn(self):
+        # bake the weapon's bullet stats into locals of a closure, so spawning
+        # a volley doesn't look anything up on self per pellet
+        half = self.bullet_size // 2
+        speed, rng, dmg, pierce = self.speed, self.rng, self.dmg, self.pierce
+        rotations = self._bullet_rotations
+
+        def spawn(source, direction, friendly):
+            x0 = source.x - half
+            y0 = source.y - half
+            x1 = source.x + half
+            y1 = source.y + half
+            gx, gy = direction
+            # every pellet gets its own corners, bullets move them in place
+            return [
+                (
+                    Coords.from_vectors([Vector2(x0, y0), Vector2(x1, y1)]),
+                    friendly,
+                    speed,
+                    Vector2(gx * cos - gy * sin, gx * sin + gy * cos),
+                    rng,
+                    dmg,
+                    pierce,
+                )
+                for cos, sin in rotations
+            ]
+
+        return spawn
 
     def pickup_mg(self):
         self._bullets_left += self.bullets_per_mg
@@ -501,29 +801,19 @@ class Weapon:
             return
         self._bullets_left_in_magazine -= self.bullets_per_shot
         self._bullets_left -= self.bullets_per_shot
-        general_direction_vector = (
-            (target - source)
-            .normalize()
-            .rotate_around_origin(random.randint(-acc, acc))
+        # (target - source).normalize().rotate(jitter), on plain floats
+        dx = target.x - source.x
+        dy = target.y - source.y
+        norm = math.hypot(dx, dy)
+        dx /= norm
+        dy /= norm
+        # uniform jitter in [-acc, acc]; randint is ~2x slower than random()
+        jitter = math.radians(acc * (2 * random.random() - 1))
+        cos = math.cos(jitter)
+        sin = math.sin(jitter)
+        return self._spawn(
+            source, (dx * cos - dy * sin, dx * sin + dy * cos), friendly
         )
-        bullargs = []
-        for angle in self._bullet_angles:
-            bullargs.append(
-                (
-                    Coords(
-                        source - Vector2(self.bullet_size // 2, self.bullet_size // 2),
-                        source + Vector2(self.bullet_size // 2, self.bullet_size // 2),
-                    ),
-                    friendly,
-                    self.speed,
-                    general_direction_vector.rotate_around_origin(angle),
-                    # general_direction_vector,
-                    self.rng,
-                    self.dmg,
-                    self.pierce,
-                )
-            )
-        return bullargs
 
     def tick(self, shoot=None):
         self._until_shoot = max(self._until_shoot - 1, 0)
@@ -552,7 +842,6 @@ class GloomFile:
         with open(gloomfilepath, "r") as self.stream:
             while True:
                 line = uncomment(self.stream.readline())
-                print("gl", line)
                 if line is None:
                     break
                 elif line.startswith("@"):
@@ -587,7 +876,6 @@ class Level:
                 break
             elif line.startswith("!"):
                 cmd, *_val = line.removeprefix("!").split(None, 1)
-                print("ll", cmd)
                 value = _val[0] if _val else None
                 if value is not None:
                     self.level_properties[cmd] = value
@@ -616,11 +904,23 @@ class Level:
 
 
 class Tilemap:
+    # what each map character stands for, and the array index it picks;
+    # anything not in here is empty floor
+    _char_kinds = {"#": ("wall", None), "^": ("player", None), "_": ("exit", None)}
+    _char_kinds.update((chr(ord("A") + i), ("enemy", i)) for i in range(26))
+    _char_kinds.update((chr(ord("a") + i), ("item", i)) for i in range(26))
+    _char_kinds.update((str(i), ("door", i - 1)) for i in range(10))
+
     def __init__(
         self, resolution, screen_size, tilemap, enemy_array, item_array, door_array
     ):
         self.resolution = resolution
-        self.cell_size = screen_size.notdot(1 / resolution)
+        csx = screen_size.x / resolution.x
+        csy = screen_size.y / resolution.y
+        self.cell_size = Vector2(csx, csy)
+        # cell edges along each axis, so building cell coords is just two lookups
+        self._cell_xs = [x * csx for x in range(resolution.x + 1)]
+        self._cell_ys = [y * csy for y in range(resolution.y + 1)]
         self.player_coords = None
         self.exit_coords = None
         self.items = []
@@ -631,111 +931,96 @@ class Tilemap:
             [(None, None) for _ in range(resolution.x)] for _ in range(resolution.y)
         ]
         self._tilemap = tilemap
-        merged_vertical = set()
-        merged_horizontal = set()
-        wall_indices = {}
-        door_merged_vertical = set()
-        door_merged_horizontal = set()
-        door_indices = {}
+        # per-cell merge bookkeeping as [y][x] grids rather than dicts/sets keyed
+        # by (x, y) tuples; an index of -1 means no wall/door in that cell
+        merged_vertical = [[False] * resolution.x for _ in range(resolution.y)]
+        merged_horizontal = [[False] * resolution.x for _ in range(resolution.y)]
+        wall_indices = [[-1] * resolution.x for _ in range(resolution.y)]
+        door_merged_vertical = [[False] * resolution.x for _ in range(resolution.y)]
+        door_merged_horizontal = [[False] * resolution.x for _ in range(resolution.y)]
+        door_indices = [[-1] * resolution.x for _ in range(resolution.y)]
+        char_kinds = self._char_kinds
         y = 0
 
         while True:
             nl = self._tilemap.readline().rstrip().expandtabs()  # important shit
-            print("tl", nl.strip())
             if nl.strip() == "!end":
-                print("tlend")
                 break
             for x, char in enumerate(nl):
-                print(x, y)
-                if x > 64:
+                if x >= self.resolution.x:
+                    continue
+                kind, index = char_kinds.get(char, (None, None))
+                if kind is None:
                     continue
                 cell_coords = self.calculate_cell_coords(x, y)
 
-                if char == "#":
+                if kind == "wall":
                     # wall
                     if (
                         x > 0
-                        and (x - 1, y) in wall_indices
-                        and (x - 1, y) not in merged_vertical
+                        and wall_indices[y][x - 1] >= 0
+                        and not merged_vertical[y][x - 1]
                     ):
                         # print("hmerge", x, y)
-                        wall_indices[(x, y)] = wall_indices[(x - 1, y)]
-                        self.walls[wall_indices[(x - 1, y)]][1][1] = cell_coords[1]
-                        merged_horizontal.add((x, y))
-                        merged_horizontal.add((x - 1, y))
+                        wall_indices[y][x] = wall_indices[y][x - 1]
+                        self.walls[wall_indices[y][x - 1]][1][1] = cell_coords[1]
+                        merged_horizontal[y][x] = True
+                        merged_horizontal[y][x - 1] = True
                     elif (
                         y > 0
-                        and (x, y - 1) in wall_indices
-                        and (x, y - 1) not in merged_horizontal
+                        and wall_indices[y - 1][x] >= 0
+                        and not merged_horizontal[y - 1][x]
                     ):
                         # print("vmerge", x, y)
-                        wall_indices[(x, y)] = wall_indices[(x, y - 1)]
-                        self.walls[wall_indices[(x, y - 1)]][1][1] = cell_coords[1]
-                        merged_vertical.add((x, y))
-                        merged_vertical.add((x, y - 1))
+                        wall_indices[y][x] = wall_indices[y - 1][x]
+                        self.walls[wall_indices[y - 1][x]][1][1] = cell_coords[1]
+                        merged_vertical[y][x] = True
+                        merged_vertical[y - 1][x] = True
 
                     else:
                         # print("new", x, y)
                         self.tilemap[y][x] = [Wall, cell_coords]
-                        wall_indices[(x, y)] = len(self.walls)
+                        wall_indices[y][x] = len(self.walls)
                         self.walls.append([Wall, cell_coords])
-                elif char.isalpha() and char.isupper():
-                    # enemy
-                    self.tilemap[y][x] = (
-                        enemy_array[ord(char) - ord("A")],
-                        cell_coords,
-                    )
-                    self.enemies.append(
-                        [
-                            enemy_array[ord(char) - ord("A")],
-                            cell_coords,
-                        ]
-                    )
-                elif char.isalpha() and char.islower():
-                    # item
-                    self.tilemap[y][x] = [
-                        item_array[ord(char) - ord("a")],
-                        cell_coords,
-                    ]
-                    self.items.append(
-                        [
-                            item_array[ord(char) - ord("a")],
-                            cell_coords,
-                        ]
-                    )
-                elif char.isnumeric():
+                elif kind == "enemy":
+                    self.tilemap[y][x] = (enemy_array[index], cell_coords)
+                    self.enemies.append([enemy_array[index], cell_coords])
+                elif kind == "item":
+                    self.tilemap[y][x] = [item_array[index], cell_coords]
+                    self.items.append([item_array[index], cell_coords])
+                elif kind == "door":
                     # door
                     # TODO Merge doors too
                     # wall
                     if (
                         x > 0
-                        and (x - 1, y) in door_indices
-                        and (x - 1, y) not in door_merged_vertical
+                        and door_indices[y][x - 1] >= 0
+                        and not door_merged_vertical[y][x - 1]
                     ):
                         # print("hmerge", x, y)
-                        door_indices[(x, y)] = door_indices[(x - 1, y)]
-                        self.doors[door_indices[(x - 1, y)]][1][1] = cell_coords[1]
-                        door_merged_horizontal.add((x, y))
-                        door_merged_horizontal.add((x - 1, y))
+                        door_indices[y][x] = door_indices[y][x - 1]
+                        self.doors[door_indices[y][x - 1]][1][1] = cell_coords[1]
+                        door_merged_horizontal[y][x] = True
+                        door_merged_horizontal[y][x - 1] = True
                     elif (
                         y > 0
-                        and (x, y - 1) in door_indices
-                        and (x, y - 1) not in merged_horizontal
+                        and door_indices[y - 1][x] >= 0
+                        and not merged_horizontal[y - 1][x]
                     ):
                         # print("vmerge", x, y)
-                        door_indices[(x, y)] = door_indices[(x, y - 1)]
-                        self.doors[door_indices[(x, y - 1)]][1][1] = cell_coords[1]
-                        door_merged_vertical.add((x, y))
-                        door_merged_vertical.add((x, y - 1))
+                        door_indices[y][x] = door_indices[y - 1][x]
+                        self.doors[door_indices[y - 1][x]][1][1] = cell_coords[1]
+                        door_merged_vertical[y][x] = True
+                        door_merged_vertical[y - 1][x] = True
 
                     else:
                         # print("new", x, y)
-                        self.tilemap[y][x] = [door_array[int(char) - 1], cell_coords]
-                        door_indices[(x, y)] = len(self.doors)
-                        self.doors.append([door_array[int(char) - 1], cell_coords])
-                elif char == "^":
+                        self.tilemap[y][x] = [door_array[index], cell_coords]
+                        door_indices[y][x] = len(self.doors)
+                        self.doors.append([door_array[index], cell_coords])
+                elif kind == "player":
                     self.player_coords = cell_coords
-                elif char == "_":
+                elif kind == "exit":
                     self.exit_coords = cell_coords
             y += 1
 
@@ -750,9 +1035,9 @@ class Tilemap:
         )
 
     def calculate_cell_coords(self, x, y):
-        return Coords(
-            Vector2(x, y).notdot(self.cell_size),
-            (Vector2(x, y) + Vector2(1, 1)).notdot(self.cell_size),
+        xs, ys = self._cell_xs, self._cell_ys
+        return Coords.from_vectors(
+            [Vector2(xs[x], ys[y]), Vector2(xs[x + 1], ys[y + 1])]
         )
 
 
@@ -881,6 +1166,7 @@ class GLOOM(Game):
     fps = 60
     player_size = Vector2(20, 20)
     enemy_size = Vector2(20, 20)
+    bullet_pool_size = 64
     """
     wall_coords = (
         # wall 1 - starting room NE wall (doorway)
@@ -897,8 +1183,11 @@ class GLOOM(Game):
 
     def __init__(self, *args):
 
-        self.walls = []
+        self.walls = {}
         self.bullets = []
+        self.bullet_pool = []
+        self.enemy_grid = {}
+        self.visibility_key = None
         self.keys_down = set()
         self.mouse_pos = (0, 0)
         self.mouse_held = False
@@ -932,10 +1221,11 @@ class GLOOM(Game):
         self.fps_meter = FPSMeter.instantiate(Coords((self.screen_size.x - 400, 30)))
 
     def start_game(self):
-        self.keycards = set()
+        # bit n is set once the keycard with keycardid n has been picked up
+        self.keycard_mask = 0
         self.level = self.levels.levels[self.level_index]
         (
-            self.walls,
+            walls,
             self.enemies,
             self.items,
             self.doors,
@@ -943,19 +1233,30 @@ class GLOOM(Game):
             self.level_exit,
         ) = self.level.map.instantiate_all()
         self.items.append(self.level_exit)
-        self.unseen_walls = self.walls.copy()
-        self.walls.extend(self.doors)
+        self.unseen_walls = set(walls)
+        # an insertion-ordered dict used as a set, so opening a door doesn't
+        # have to search a list
+        self.walls = dict.fromkeys(walls + self.doors)
+        self.wall_grid = WallGrid(
+            self.walls, self.level.map.cell_size, self.level.map.resolution
+        )
+        self.line_cache = {}
+        self.fill_bullet_pool()
+        self.visibility_key = None
         self.sprites.try_run("check")
         self.canvas.tag_lower("wall")
         self.canvas.tag_lower("item")
         self.canvas.tag_lower("enemy")
 
     def is_pressed(self, *keys):
-        return all(key in self.keys_down for key in keys)
+        return self.keys_down.issuperset(keys)
 
     def finish_level(self):
         self.level_index += 1
         if self.level_index >= len(self.levels.levels):
+            # quit the bullets first, so the pool and self.bullets don't hold
+            # on to deleted canvas items
+            self.recycle_bullets()
             self.sprites.destroy()
             self.won = True
             WonLabel.instantiate(
@@ -967,29 +1268,49 @@ class GLOOM(Game):
             
             return
         self.reset()
-        self.run_timers()
 
     def reset(self):
-        self.timers = []
         Sprites(
-            self.walls + self.enemies + self.doors + self.items + [self.player]
+            list(self.walls)
+            + self.enemies
+            + self.doors
+            + self.items
+            + [self.player]
         ).destroy()
-        self.canvas.delete("wall")
-        self.canvas.delete("item")
-        self.canvas.delete("enemy")
+        self.recycle_bullets()
+        self.canvas.delete("wall", "item", "enemy")
         self.start_game()
 
+    def recycle_bullets(self):
+        # bullets in flight just go back to the pool for the next level
+        for bullet in self.bullets:
+            bullet.quit()
+        self.bullet_pool.extend(self.bullets)
+        self.bullets = []
+
+    def fill_bullet_pool(self):
+        # create the bullets' canvas items up front, so firing doesn't have to
+        while len(self.bullet_pool) < self.bullet_pool_size:
+            bullet = Bullet(
+                Coords((0, 0), (0, 0)), True, 1, Vector2(0, 0), 0, 0, 0
+            )
+            bullet.quit()
+            self.bullet_pool.append(bullet)
+
     def tick(self, delta):
         deltamult = delta / (1 / self.fps)
         self.fps_meter.update_text(delta)
-        if self.is_pressed("w"):
-            self.player.move(UP * self.player_speed * deltamult)
-        if self.is_pressed("a"):
-            self.player.move(LEFT * self.player_speed * deltamult)
-        if self.is_pressed("s"):
-            self.player.move(DOWN * self.player_speed * deltamult)
-        if self.is_pressed("d"):
-            self.player.move(RIGHT * self.player_speed * deltamult)
+        # UP/LEFT/DOWN/RIGHT * step, without the two temporaries per key
+        step = self.player_speed * deltamult
+        keys_down = self.keys_down
+        if "w" in keys_down:
+            self.player.move(Vector2(0, -step))
+        if "a" in keys_down:
+            self.player.move(Vector2(-step, 0))
+        if "s" in keys_down:
+            self.player.move(Vector2(0, step))
+        if "d" in keys_down:
+            self.player.move(Vector2(step, 0))
         if self.mouse_held:
             bullargss = self.weapon.tick(
                 (self.player.center_point, self.mouse_pos, True, 1)
@@ -1016,54 +1337,111 @@ class GLOOM(Game):
                     self.weapon = self.weapons[int(dig) - 1]
                     self.curr_weapon_index = int(dig) - 1
         # print(len(self.bullets))
+        # bucket the enemies once, bullets only look at the cells around them
+        # (dropping the ones that died since the last tick)
+        enemy_grid = self.enemy_grid = collections.defaultdict(list)
+        alive = []
+        for enemy in self.enemies:
+            if enemy.dead:
+                continue
+            alive.append(enemy)
+            center = enemy.center_point
+            enemy_grid[int(center.x) >> 6, int(center.y) >> 6].append(enemy)
+        self.enemies = alive
+        flying = []
+        keep = flying.append
+        recycle = self.bullet_pool.append
         for bullet in self.bullets:
-            if not bullet.flying:
-                self.bullets.remove(bullet)
             bullet.move()
-        for item in self.items:
-            if item.collision_check(self.player.coords, self.player):
-                print(item)
-                item.on_pickup()
-                item.quit()
-                if item in self.items:
-                    self.items.remove(item)
+            if bullet.flying:
+                keep(bullet)
+            else:
+                recycle(bullet)
+        self.bullets = flying
+        items = self.items
+        remaining = []
+        player = self.player
+        for item in items:
+            if item.try_pickup(player):
+                if self.items is not items:
+                    # picked up the exit, the next level brought its own items
+                    return
+            else:
+                remaining.append(item)
+        self.items = remaining
 
     def check_wall_collision(self, coords, sprite):
-        for wall in self.walls:
+        return self.find_wall_collision(coords, sprite) is not None
+
+    def find_wall_collision(self, coords, sprite, candidates=None):
+        # candidates can be a wall_grid.query_box() result covering coords;
+        # collision_check does the bounding box test itself
+        if candidates is None:
+            candidates = self.wall_grid.query_box(coords)
+        for _, wall in candidates:
             if wall.collision_check(coords, sprite):
-                return True
-        return False
+                return wall
+        return None
+
+    def remove_wall(self, wall):
+        del self.walls[wall]
+        self.wall_grid.remove(wall)
+        self.line_cache.clear()
+        self.visibility_key = None
 
-    def check_line_collision(self, p1, p2, what, ignore=None):
+    def check_line_collision(self, p1, p2, what, ignore=None, hint=None):
         if isinstance(what, Wall):
             if not ENABLE_WALL_VISIBILITY_CHECK or what not in self.unseen_walls:
                 return False
-        walls = self.walls.copy()
-
-        if ignore in walls:
-            # print(ignore)
-            walls.remove(ignore)
-        for wall in walls:
-            if wall.line_cross_check(p1, p2):
-                return True
-        if what in self.unseen_walls:
-            self.unseen_walls.remove(what)
+        # the same line gives the same answer until a wall goes away. only the
+        # last line per element is kept: visibility re-runs every element's
+        # check whenever anything moves, and most of those lines are unchanged
+        line = (p1.x, p1.y, p2.x, p2.y, ignore)
+        cached = self.line_cache.get(what)
+        if cached is not None and cached[0] == line:
+            blocked = cached[1]
+        else:
+            blocked = self._line_blocked(p1, p2, what, ignore, hint)
+            self.line_cache[what] = (line, blocked)
+        if not blocked:
+            self.unseen_walls.discard(what)
+        return blocked
+
+    def _line_blocked(self, p1, p2, what, ignore, hint):
+        # the wall that blocked this line last time most likely still does
+        if (
+            hint is not None
+            and hint in self.wall_grid.entries
+            and hint.line_cross_check(p1, p2)
+        ):
+            return True
+        blocker = self.wall_grid.query_segment(p1, p2, ignore)
+        if blocker is not None:
+            what._last_blocker = blocker
+            return True
         return False
 
-    def get_sentient(self, friendly):
+    def nearby_sentients(self, coords, friendly):
         if not friendly:
             return [self.player]
-        else:
-            return self.enemies
+        a, b = coords.coords
+        cx = int((a.x + b.x) * 0.5) >> 6
+        cy = int((a.y + b.y) * 0.5) >> 6
+        grid = self.enemy_grid
+        nearby = []
+        for x in (cx - 1, cx, cx + 1):
+            for y in (cy - 1, cy, cy + 1):
+                if (x, y) in grid:
+                    nearby.extend(grid[x, y])
+        return nearby
 
     def has_keycard(self, keycardid):
-        return keycardid in self.keycards
+        return bool(self.keycard_mask & (1 << keycardid))
 
     @Game.event_handler("die")
     def _on_die(self, who):
-        if who in self.enemies:
-            self.enemies.remove(who)
-        elif who == self.player:
+        # dead enemies are pruned from self.enemies in tick
+        if who == self.player:
             self.destroy()
 
     @Game.event_handler("shoot")
@@ -1084,8 +1462,6 @@ class GLOOM(Game):
         self.known_weapons = self.startlevel_kweapons
         self.reset()
 
-        self.run_timers()
-
     @Game.on("q", True)
     def _quit(self, event):
         if self.won:
@@ -1093,8 +1469,8 @@ class GLOOM(Game):
 
     @Game.on("<KeyRelease>", True)
     def _on_key_release(self, event):
-        if event.keysym and event.keysym.lower() in self.keys_down:
-            self.keys_down.remove(event.keysym.lower())
+        if event.keysym:
+            self.keys_down.discard(event.keysym.lower())
 
     @Game.on("<Motion>", True)
     def _on_mouse_move(self, event):
@@ -1114,10 +1490,22 @@ class GLOOM(Game):
 class Label(Sprite):
     shape = Shape.TEXT
 
+    def __init_subclass__(cls):
+        # compile fmt into a method once instead of eval'ing it every tick
+        if "fmt" in cls.__dict__:
+            namespace = {}
+            exec(
+                "def _format(self):\n    return f" + repr(cls.fmt),
+                globals(),
+                namespace,
+            )
+            cls._format = namespace["_format"]
+
     def tick(self):
-        self.text = eval("f" + repr(self.fmt))
+        self.text = self._format()
         self.label_tick()
-        self.update()
+        # labels never move; update only talks to Tk if the text or fill changed
+        self.update(coords=False)
 
     def label_tick(self):
         pass
@@ -1128,12 +1516,17 @@ class GameElement(Sprite):
         self.active = False
         self.seen = False
         self._defaultfill = self.kwargs.get("fill", "#000")
+        self._last_blocker = None
+        # a new element hasn't been checked against the player's position yet
+        self.game.visibility_key = None
         super().__init__(*args, **kwargs)
 
     def check(self):
         line = (self.center_point, self.game.player.center_point)
 
-        if self.game.check_line_collision(*line, what=self, ignore=self):
+        if self.game.check_line_collision(
+            *line, what=self, ignore=self, hint=self._last_blocker
+        ):
             self.active = False
             if self.seen:
                 self.fill = self.remembered_color_hook()
@@ -1143,7 +1536,9 @@ class GameElement(Sprite):
             self.active = True
             self.seen = True
             self.fill = self.active_color_hook()
-        self.kwargs["outline"] = self.fill
+        if self.kwargs.get("outline") != self.fill:
+            self.kwargs["outline"] = self.fill
+            self._dirty_config = True
         self.update(coords=False)  #
 
     def tick(self):
@@ -1161,42 +1556,30 @@ class GameElement(Sprite):
 
 class HasCollision(GameElement):
     def __init__(self, coords, *args):
-        self.points = (
-            coords[0],
-            coords[1],
-            Vector2(coords[0].x, coords[1].y),
-            Vector2(coords[1].x, coords[0].y),
-        )
         self.can_collide = True
         self.lines = (
             (coords[0], coords[1]),
             (Vector2(coords[0].x, coords[1].y), Vector2(coords[1].x, coords[0].y)),
         )
+        self.segments = tuple(
+            (a.x, a.y, b.x - a.x, b.y - a.y, self) for (a, b) in self.lines
+        )
         super().__init__(coords, *args)
 
-    def collision_check(self, other, sprite):
+    def collision_check(self, coords, sprite):
+        # coords is the other box's Coords, sprite the one it belongs to
         if not self.can_collide:
             return False
-        other_points = (
-            other.coords[0],
-            other.coords[1],
-            Vector2(other.coords[0].x, other.coords[1].y),
-            Vector2(other.coords[1].x, other.coords[0].y),
-        )
-        collides = any(
-            self.coords[0].x <= point.x <= self.coords[1].x
-            and self.coords[0].y <= point.y <= self.coords[1].y
-            for point in other_points
-        ) or any(
-            other[0].x <= point.x <= other[1].x and other[0].y <= point.y <= other[1].y
-            for point in self.points
-        )
-        if collides:
-            self.on_collide(sprite)
-        return collides
+        a, b = self.coords.coords
+        c, d = coords.coords
+        # boxes touching at an edge still count, like they always did
+        if b.x < c.x or d.x < a.x or b.y < c.y or d.y < a.y:
+            return False
+        self.on_collide(sprite)
+        return True
 
     def line_cross_check(self, p1, p2):
-        return any(intersect(p1, p2, b1, b2) for (b1, b2) in self.lines)
+        return intersect_batch(p1, p2, self.segments) is not None
 
     def on_collide(self, sprite):
         pass
@@ -1213,19 +1596,53 @@ class PlayerOrEnemy(HasCollision):
         super().__init__(coords, *args, **kwargs)
 
     def move(self, delta):
+        # every step goes step/NSTEPS of delta past the current coords, so no
+        # step ends up further than (NSTEPS + 1) / 2 * delta from the start;
+        # the walls near that swept box are looked up just once
+        dx = delta.x
+        dy = delta.y
+        a, b = self.coords.coords
+        reach = (NSTEPS + 1) / 2
+        cx = a.x + dx * reach
+        cy = a.y + dy * reach
+        ex = b.x + dx * reach
+        ey = b.y + dy * reach
+        candidates = self.game.wall_grid.query_box(
+            Coords.from_vectors(
+                [
+                    Vector2(min(a.x, cx), min(a.y, cy)),
+                    Vector2(max(b.x, ex), max(b.y, ey)),
+                ]
+            )
+        )
+        screen = self.game.screen_size
         for step in range(1, NSTEPS + 1):
-            ncoords = self.coords + (delta / NSTEPS) * step
-
-            if (
-                0 <= ncoords[0].x
-                and ncoords[1].x <= self.game.screen_size.x
-                and 0 <= ncoords[0].y
-                and ncoords[1].y <= self.game.screen_size.y
-            ):
-                if not self.game.check_wall_collision(ncoords, self):
+            # the bounds check runs on floats, ncoords are only built when the
+            # step stays on screen
+            sx = dx / NSTEPS * step
+            sy = dy / NSTEPS * step
+            a, b = self.coords.coords
+            x0 = a.x + sx
+            y0 = a.y + sy
+            x1 = b.x + sx
+            y1 = b.y + sy
+            if 0 <= x0 and x1 <= screen.x and 0 <= y0 and y1 <= screen.y:
+                ncoords = Coords.from_vectors([Vector2(x0, y0), Vector2(x1, y1)])
+                blocker = self.game.find_wall_collision(ncoords, self, candidates)
+                if blocker is None:
                     self.coords = ncoords
+                    # whoever moved, the player's sight lines have changed
+                    self.game.visibility_key = None
                     if self.active:
                         self.update()
+                elif blocker.can_collide:
+                    # the later steps only push further into the same wall
+                    self.on_move()
+                    break
+            else:
+                # or further off the screen
+                self.on_move()
+                break
             self.on_move()
 
     def hit(self, bullet):
@@ -1261,6 +1678,13 @@ class Item(HasCollision):
         self.picked_up = False
         super().__init__(*args, **kwargs)
 
+    def try_pickup(self, player):
+        if not self.collision_check(player.coords, player):
+            return False
+        self.on_pickup()
+        self.quit()
+        return True
+
     def on_pickup(self):
         if not self.picked_up:
             self.on_pickup_item()
@@ -1275,8 +1699,9 @@ class WeaponPickupItem(Item):
 
     def on_pickup_item(self):
         self.game.pline.pline(f"Picked up a {self.weapclass.__name__}")
+        weapclass = self.weapclass
         for weap in self.game.weapons:
-            if weap.__class__ == self.weapclass:
+            if weap.__class__ == weapclass:
                 weap._bullets_left += weap.bullets_per_mg
                 weap._bullets_left_in_magazine = weap.bullets_per_mg
                 break
@@ -1301,7 +1726,7 @@ class Door(HasCollision):
         if sprite.name == "Player":
             # print("collPlayer")
             if self.game.has_keycard(self.keycardid):
-                self.game.walls.remove(self)
+                self.game.remove_wall(self)
                 self.can_collide = False
                 self.quit()
 
@@ -1312,28 +1737,55 @@ class KeyCard(Item):
 
     def on_pickup_item(self):
         self.game.pline.pline(f"Picked up a {self.keycardname} keycard")
-        self.game.keycards.add(self.keycardid)
+        self.game.keycard_mask |= 1 << self.keycardid
 
 
 @GLOOM.sprite()
 class Pline(Sprite):
     shape = Shape.TEXT
     kwargs = {"fill": "#fff", "text": "", "font": (FONT, 20)}
+    _lines_dirty = False
+    _expiry_scheduled = False
 
     def __init__(self, *args, **kwargs):
-        self.lines = []
+        self.lines = collections.deque()
+        # perf_counter() deadline of each line, oldest first
+        self._expiries = collections.deque()
         super().__init__(*args, **kwargs)
 
     def depline(self):
-        del self.lines[0]
+        self.lines.popleft()
         self.coords -= Vector2(0, self.kwargs["font"][1])
-        self._refresh()
+        self._lines_dirty = True
 
     def pline(self, text):
         self.coords += Vector2(0, self.kwargs["font"][1])
         self.lines.append(text)
-        self._refresh()
-        self.game.after(1000, self.depline)
+        self._lines_dirty = True
+        self._expiries.append(time.perf_counter() + 1)
+        if not self._expiry_scheduled:
+            self._expiry_scheduled = True
+            self.game.after(1000, self._expire)
+
+    def _expire(self):
+        # a single pending timer for all the lines: drop every line that is
+        # due (allowing for a timer firing a hair early), then wait for the next
+        now = time.perf_counter()
+        expiries = self._expiries
+        while expiries and expiries[0] <= now + 0.001:
+            expiries.popleft()
+            self.depline()
+        if expiries:
+            self.game.after(math.ceil((expiries[0] - now) * 1000), self._expire)
+        else:
+            self._expiry_scheduled = False
+
+    def tick(self):
+        # pline/depline only mark the text stale, so a burst of them in one
+        # frame costs a single join and canvas update
+        if self._lines_dirty:
+            self._lines_dirty = False
+            self._refresh()
 
     def _refresh(self):
         self.text = "\n".join(self.lines)
@@ -1555,10 +2007,19 @@ class LevelExit(Item):
 class FPSMeter(Sprite):
     shape = Shape.TEXT
     kwargs = {"text": "", "font": (FONT, 10), "fill": "#ddd"}
+    _shown_fps100 = None
 
     def update_text(self, delta):
-        self.text = f"FPS: {1/delta:.2f}"
-        self.update()
+        if delta <= 0:
+            return
+        # the readout has two decimals, so only reformat when the fps in
+        # hundredths changes
+        fps100 = round(100 / delta)
+        if fps100 == self._shown_fps100:
+            return
+        self._shown_fps100 = fps100
+        self.text = f"FPS: {fps100 / 100:.2f}"
+        self.update(coords=False)
 
 
 @GLOOM.sprite()
@@ -1570,9 +2031,19 @@ class AmmoMeter(Label):
 @GLOOM.sprite()
 class KeycardIndicator(Label):
     kwargs = {"text": "", "font": (FONT, 20), "fill": "#ea0"}
-    fmt = (
-        "Keycards: {','.join(KEYCARDS[kc].keycardname[0] for kc in self.game.keycards)}"
-    )
+    _keycard_mask = None
+
+    def _format(self):
+        # the text only needs rebuilding when a keycard is picked up
+        mask = self.game.keycard_mask
+        if mask != self._keycard_mask:
+            self._keycard_mask = mask
+            self._keycard_text = "Keycards: " + ",".join(
+                KEYCARDS[kc].keycardname[0]
+                for kc in sorted(KEYCARDS)
+                if mask & (1 << kc)
+            )
+        return self._keycard_text
 
 
 @GLOOM.sprite()
@@ -1598,29 +2069,26 @@ class HealthMeter(Label):
     kwargs = {"text": "", "font": (FONT, 20), "fill": "#0a0"}
     fmt = "HEALTH:{int(self.game.player.hp)}"
 
+    # one colour per 10 hp, from "#a00" (under 10) up to "#190" (90 and over)
+    _hp_colors = (
+        "#a00",
+        "#910",
+        "#820",
+        "#730",
+        "#640",
+        "#550",
+        "#460",
+        "#370",
+        "#280",
+        "#190",
+    )
+
     def label_tick(self):
-        if self.game.player.hp == 100:
+        hp = self.game.player.hp
+        if hp == 100:
             self.fill = "#0a0"
-        elif self.game.player.hp >= 90:
-            self.fill = "#190"
-        elif self.game.player.hp >= 80:
-            self.fill = "#280"
-        elif self.game.player.hp >= 70:
-            self.fill = "#370"
-        elif self.game.player.hp >= 60:
-            self.fill = "#460"
-        elif self.game.player.hp >= 50:
-            self.fill = "#550"
-        elif self.game.player.hp >= 40:
-            self.fill = "#640"
-        elif self.game.player.hp >= 30:
-            self.fill = "#730"
-        elif self.game.player.hp >= 20:
-            self.fill = "#820"
-        elif self.game.player.hp >= 10:
-            self.fill = "#910"
         else:
-            self.fill = "#a00"
+            self.fill = self._hp_colors[max(0, min(9, int(hp // 10)))]
 
 
 @GLOOM.sprite()
@@ -1639,7 +2107,14 @@ class Player(PlayerOrEnemy):
         print(self.hp)
 
     def on_move(self):
-        self.game.sprites.try_run("check")
+        # visibility only needs re-running when something changed since the
+        # last run; moves, new elements, opened doors and level starts all
+        # clear visibility_key
+        center = self.center_point
+        key = (center.x, center.y)
+        if key != self.game.visibility_key:
+            self.game.visibility_key = key
+            self.game.sprites.try_run("check")
 
 
 class Enemy(PlayerOrEnemy):
@@ -1648,6 +2123,14 @@ class Enemy(PlayerOrEnemy):
     tag = "enemy"
     drop = ()
 
+    def __init_subclass__(cls):
+        # one colour per hp percent, so active_color_hook is a single lookup
+        if "_active_colors" in cls.__dict__:
+            last = len(cls._active_colors) - 1
+            cls._color_by_hp_pct = tuple(
+                cls._active_colors[min(pct // 10, last)] for pct in range(101)
+            )
+
     def __init__(self, *args, **kwargs):
         self.active = False
         self.target = None
@@ -1656,6 +2139,7 @@ class Enemy(PlayerOrEnemy):
         self.weapon = self._weapon(self._ammo)
         self.speed = self._speed
         self.hp = self.maxhp = self._hp
+        self._hp_to_pct = 100 / self.maxhp
         self.armor = self._armor
         self._ticks_wo_player = 0
         super().__init__(*args, hp=self.hp, armor=self.armor, **kwargs)
@@ -1664,13 +2148,17 @@ class Enemy(PlayerOrEnemy):
         return self._remembered_color
 
     def active_color_hook(self):
-        return self._active_colors[int(self.hp / (self.maxhp / 10))]
+        pct = int(self.hp * self._hp_to_pct)
+        if pct < 0:
+            pct = 0
+        elif pct > 100:
+            pct = 100
+        return self._color_by_hp_pct[pct]
 
     def forget(self):
         self.target = None
 
     def sprite_tick(self):
-        line = (self.center_point, self.game.player.center_point)
         if self._ticks_wo_player == 100:  # 15 secs
             self.target = None
         if self.active:
@@ -1680,42 +2168,42 @@ class Enemy(PlayerOrEnemy):
         else:
             self._ticks_wo_player += 1
         if self.target is not None:
-            if (
-                self.target - self.center_point
-            ).norm > 10 and self.weapon._bullets_left > 0:  # arbitrary/placeholder
-                movevect = (
-                    (self.target - self.center_point).normalize()
-                    * self.speed
-                    * ((self.target - self.center_point).norm / self.weapon.rng)
-                )
+            # plain floats and squared distances, no Vector2 diffs or sqrt
+            target = self.target
+            weapon = self.weapon
+            center = self.center_point
+            dx = target.x - center.x
+            dy = target.y - center.y
+            # the direction times speed * (distance / range) is just the offset
+            # scaled by speed / range
+            scale = self.speed / weapon.rng
+            # arbitrary/placeholder
+            if dx * dx + dy * dy > 100 and weapon._bullets_left > 0:
                 # move in each direction separately to avoid getting stuck on walls
-                self.move(movevect.notdot(Vector2(1, 0)))
-                self.move(movevect.notdot(Vector2(0, 1)))
-            if (
-                self.weapon._bullets_left == 0
-                and (self.target - self.center_point).norm <= self.game.weapon.rng
+                self.move(Vector2(dx * scale, 0))
+                self.move(Vector2(0, dy * scale))
+                center = self.center_point
+                dx = target.x - center.x
+                dy = target.y - center.y
+            if weapon._bullets_left == 0 and dx * dx + dy * dy <= (
+                self.game.weapon.rng**2
             ):
-                movevect = (
-                    (self.target - self.center_point).normalize()
-                    * self.speed
-                    * ((self.target - self.center_point).norm / self.weapon.rng)
-                    * -1
-                )
-                self.move(movevect.notdot(Vector2(1, 0)))
-                self.move(movevect.notdot(Vector2(0, 1)))
+                self.move(Vector2(-dx * scale, 0))
+                self.move(Vector2(0, -dy * scale))
+                center = self.center_point
+                dx = target.x - center.x
+                dy = target.y - center.y
 
             # only shoot when in range and active
             # the enemies will generally get worse weapons because their aim is better
             if (
                 self.active
-                and (self.target - self.center_point).norm <= self.weapon.rng
-                and self.weapon._bullets_left > 0
+                and dx * dx + dy * dy <= weapon.rng**2
+                and weapon._bullets_left > 0
             ):
-                self.send_event(
-                    "shoot", self.weapon, self.target, self.center_point, self.accuracy
-                )
+                self.send_event("shoot", weapon, target, center, self.accuracy)
             else:
-                self.weapon.tick()  # allow cooldown
+                weapon.tick()  # allow cooldown
 
     def on_die(self):
         # drop items
@@ -1739,7 +2227,7 @@ class Pistoller(Enemy):
     _hp = 50
     _armor = 0
     _remembered_color = "#a00"
-    _active_colors = [
+    _active_colors = (
         "#f00",
         "#f11",
         "#f22",
@@ -1751,7 +2239,7 @@ class Pistoller(Enemy):
         "#f88",
         "#f99",
         "#faa",
-    ]
+    )
 
 
 @GLOOM.sprite()
@@ -1763,7 +2251,7 @@ class Shotgunner(Enemy):
     _hp = 40
     _armor = 0
     _remembered_color = "#aa0"
-    _active_colors = [
+    _active_colors = (
         "#f50",
         "#f61",
         "#f72",
@@ -1775,7 +2263,7 @@ class Shotgunner(Enemy):
         "#fd8",
         "#fe9",
         "#ffa",
-    ]
+    )
 
 
 @GLOOM.sprite()
@@ -1787,7 +2275,7 @@ class Defender(Enemy):
     _accuracy = 10
     _armor = 100
     _remembered_color = "#aaa"
-    _active_colors = [
+    _active_colors = (
         "#d66",
         "#d77",
         "#d88",
@@ -1800,7 +2288,7 @@ class Defender(Enemy):
         "#dcc",
         "#cbb",
         "#bbb",
-    ]
+    )
 
 
 @GLOOM.sprite()
@@ -1812,7 +2300,7 @@ class SchoolShooter(Enemy):
     _accuracy = 40  # cant shoot shit lol
     _armor = 100
     _remembered_color = "#161"
-    _active_colors = [
+    _active_colors = (
         "#a01",
         "#911",
         "#821",
@@ -1824,7 +2312,7 @@ class SchoolShooter(Enemy):
         "#281",
         "#191",
         "#0a1",
-    ]
+    )
 
 
 @GLOOM.sprite()
@@ -1837,7 +2325,7 @@ class Death(Enemy):
     _accuracy = 0
     _armor = 500
     _remembered_color = "#909"
-    _active_colors = [
+    _active_colors = (
         "#a00",
         "#a01",
         "#a02",
@@ -1850,7 +2338,7 @@ class Death(Enemy):
         "#a09",
         "#a0a",
         "#a0b",
-    ]
+    )
 
 
 @GLOOM.sprite()
@@ -1859,6 +2347,10 @@ class Bullet(Sprite):
     kwargs = {"outline": "#ccc", "fill": "#ccc"}
 
     def __init__(self, coords, friendly, speed, dir, rng, dmg, pierce, *args, **kwargs):
+        self.load(friendly, speed, dir, rng, dmg, pierce)
+        super().__init__(coords, *args, **kwargs)
+
+    def load(self, friendly, speed, dir, rng, dmg, pierce):
         self.speed = speed
         self.dir = dir
         # print(self.dir.x, self.dir.y, self.speed)
@@ -1868,22 +2360,47 @@ class Bullet(Sprite):
         self.friendly = friendly
         self.pierce = pierce
         self.lifetime = self.rng / self.speed
-        super().__init__(coords, *args, **kwargs)
+        self.velocity = dir * speed
+
+    @classmethod
+    def instantiate(cls, coords, *bullargs):
+        # reuse a spent bullet's canvas item instead of creating a new one
+        if not cls.game.bullet_pool:
+            return cls(coords, *bullargs)
+        bullet = cls.game.bullet_pool.pop()
+        bullet.load(*bullargs)
+        bullet.coords = coords
+        cls.game.sprites.add_sprite(bullet)
+        bullet.update(kwargs=False)
+        cls.game.canvas_wrapper.itemconfig_call(bullet.id, {"state": "normal"})
+        return bullet
+
+    def quit(self):
+        # hide the item; GLOOM.tick hands the bullet back to the pool
+        if self.flying:
+            self.flying = False
+            self.detach()
+            self.game.canvas_wrapper.itemconfig_call(self.id, {"state": "hidden"})
 
     def move(self):
-        if self.lifetime <= 0 or self.game.check_wall_collision(self.coords, self):
+        game = self.game
+        coords = self.coords
+        if self.lifetime <= 0 or game.check_wall_collision(coords, self):
             self.quit()
-            self.flying = False
-        for en in self.game.get_sentient(self.friendly):
-            if en.collision_check(self.coords, self):
+        for en in game.nearby_sentients(coords, self.friendly):
+            if en.collision_check(coords, self):
                 en.hit(self)
                 self.quit()
-                self.flying = False
                 # print("hit", en)
+        if not self.flying:
+            return
 
         self.lifetime -= 1
-        self.coords += self.dir * self.speed
-        self.update()
+        # moved in place rather than building new Coords, this runs per bullet
+        # per frame
+        self.shift(self.velocity)
+        # a bullet's look never changes, only its position needs pushing to Tk
+        self.update(kwargs=False)
 
 
 ITEM_CLASSES = {